@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 
+import fnmatch
+import hashlib
 import os
+import pickle
+import re
 import shutil
 import tomllib
 from pathlib import Path
 
 # Global configuration
 BUNDLE_CONFIG_FILE = "bundles.toml"
+BUNDLE_CACHE_FILE = ".bundles.toml.cache"
 
 # ANSI color codes for colored output
 class Colors:
@@ -40,22 +45,110 @@ IGNORE_PATTERNS = [
 ]
 
 
+# Split the patterns once: exact names go in a set, wildcards into one regex.
+# With no wildcard patterns the joined regex would be empty and match every
+# name, so it is left as None instead.
+IGNORE_EXACT = frozenset(p for p in IGNORE_PATTERNS if "*" not in p)
+_wildcards = [fnmatch.translate(p) for p in IGNORE_PATTERNS if "*" in p]
+IGNORE_WILDCARD = re.compile("|".join(_wildcards)) if _wildcards else None
+
+
+def _is_ignored(name: str) -> bool:
+    return name in IGNORE_EXACT or (
+        IGNORE_WILDCARD is not None and IGNORE_WILDCARD.match(name) is not None
+    )
+
+
 def should_ignore(path: str) -> bool:
     """Check if a path should be ignored based on ignore patterns."""
-    basename = os.path.basename(path)
+    return _is_ignored(os.path.basename(path))
+
+
+def ignored_names(_dir: str, names: list[str]) -> list[str]:
+    """copytree ignore callback; names are already basenames."""
+    return [n for n in names if _is_ignored(n)]
 
-    # Check exact matches
-    if basename in IGNORE_PATTERNS:
-        return True
 
-    # Check wildcard patterns
-    for pattern in IGNORE_PATTERNS:
-        if "*" in pattern:
-            # Simple wildcard matching for *.ext patterns
-            if pattern.startswith("*.") and basename.endswith(pattern[1:]):
-                return True
+def load_config(config_path: Path, cache_path: Path) -> dict:
+    """Load the TOML config, reusing the cached parse if the file is unchanged."""
+    config_bytes = config_path.read_bytes()
+    digest = hashlib.sha256(config_bytes).digest()
 
-    return False
+    # The cache is only an optimization: anything unreadable, stale, or of the
+    # wrong shape (unpickling can raise almost anything) falls through to a re-parse
+    try:
+        with open(cache_path, "rb") as f:
+            cached_digest, cached_config = pickle.load(f)
+        if cached_digest == digest and isinstance(cached_config, dict):
+            return cached_config
+    except Exception:
+        pass
+
+    config = tomllib.loads(config_bytes.decode("utf-8"))
+
+    # Write to a temp file and swap it in so a partial cache is never read
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((digest, config), f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+    return config
+
+
+# Directories already created during this run
+_created_dirs: set[str] = set()
+
+
+def ensure_dir(path: str) -> None:
+    """Create a directory tree once per run, skipping repeat makedirs calls."""
+    if path in _created_dirs:
+        return
+    os.makedirs(path, exist_ok=True)
+    _created_dirs.add(path)
+
+
+def fast_copy(src: str, dst: str) -> str:
+    """Copy a file with its metadata, letting the kernel move the data when possible.
+
+    os.copy_file_range keeps the copy in-kernel and can reflink on copy-on-write
+    filesystems; anything it can't handle falls back to shutil.copy2.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            # A 0 return before the expected size (procfs, some FUSE mounts) means
+            # the kernel copied nothing useful, so redo it the portable way
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return dst
+        except OSError:
+            pass
+
+    return shutil.copy2(src, dst)
+
+
+def count_files(path: str) -> int:
+    """Count files under a directory tree without following symlinks."""
+    count = 0
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                # DirEntry.is_dir reuses the type from readdir, avoiding a stat per entry
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    count += 1
+    return count
 
 
 def main():
@@ -67,8 +160,7 @@ def main():
         return 1
 
     try:
-        with open(config_path, "rb") as f:
-            config = tomllib.load(f)
+        config = load_config(config_path, Path(BUNDLE_CACHE_FILE))
     except Exception as e:
         colored_print(f"Error reading configuration file: {e}", Colors.RED)
         return 1
@@ -86,7 +178,7 @@ def main():
     colored_print(f"Found {len(bundles)} bundle(s) to process\n", Colors.BLUE)
 
     # Create target directory
-    os.makedirs(target_dir, exist_ok=True)
+    ensure_dir(target_dir)
 
     total_files = 0
 
@@ -94,7 +186,7 @@ def main():
         dest = os.path.join(target_dir, bundle['dest'])
 
         # Create target directory if it doesn't exist
-        os.makedirs(dest, exist_ok=True)
+        ensure_dir(dest)
 
         colored_print(f"[{i}/{len(bundles)}] Bundling to {dest}:", Colors.BOLD + Colors.MAGENTA)
 
@@ -104,28 +196,29 @@ def main():
             if os.path.exists(source_path):
                 if os.path.isdir(source_path):
                     # Copy directory contents
-                    for item in os.listdir(source_path):
-                        s = os.path.join(source_path, item)
-                        d = os.path.join(dest, item)
-
-                        # Skip ignored patterns
-                        if should_ignore(s):
-                            colored_print(f"  Skipped (ignored): {item}", Colors.YELLOW)
-                            continue
-
-                        if os.path.isdir(s):
-                            shutil.copytree(
-                                s,
-                                d,
-                                dirs_exist_ok=True,
-                                ignore=lambda dir, files: [
-                                    f for f in files if should_ignore(os.path.join(dir, f))
-                                ],
-                            )
-                            colored_print(f"  Copied directory: {item}", Colors.GREEN)
-                        else:
-                            shutil.copy2(s, d)
-                            colored_print(f"  Copied file: {item}", Colors.GREEN)
+                    with os.scandir(source_path) as entries:
+                        for entry in entries:
+                            item = entry.name
+                            s = entry.path
+                            d = os.path.join(dest, item)
+
+                            # Skip ignored patterns
+                            if should_ignore(item):
+                                colored_print(f"  Skipped (ignored): {item}", Colors.YELLOW)
+                                continue
+
+                            if entry.is_dir():
+                                shutil.copytree(
+                                    s,
+                                    d,
+                                    dirs_exist_ok=True,
+                                    copy_function=fast_copy,
+                                    ignore=ignored_names,
+                                )
+                                colored_print(f"  Copied directory: {item}", Colors.GREEN)
+                            else:
+                                fast_copy(s, d)
+                                colored_print(f"  Copied file: {item}", Colors.GREEN)
                 else:
                     # Copy single file
                     if should_ignore(source_path):
@@ -134,13 +227,13 @@ def main():
 
                     filename = os.path.basename(source_path)
                     d = os.path.join(dest, filename)
-                    shutil.copy2(source_path, d)
+                    fast_copy(source_path, d)
                     colored_print(f"  Copied file: {filename}", Colors.GREEN)
             else:
                 colored_print(f"  Warning: Source path does not exist: {source_path}", Colors.RED)
 
         # Count files in this destination
-        file_count = sum(len(files) for _, _, files in os.walk(dest))
+        file_count = count_files(dest)
         total_files += file_count
 
         colored_print(f"  Total files in {dest}: {file_count}\n", Colors.CYAN)
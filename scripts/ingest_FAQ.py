@@ -1,7 +1,26 @@
-import json
+import functools
+import queue
+import threading
 import boto3
 import argparse
 import botocore
+import ijson
+from botocore.config import Config
+
+# Adaptive retries back off instead of failing when S3 throttles the uploads
+_BOTO_CFG = Config(retries={"max_attempts": 10, "mode": "adaptive"}, max_pool_connections=64)
+
+
+@functools.cache
+def get_s3_client():
+    """Return the S3 client shared by every call in this script."""
+    return boto3.client("s3", config=_BOTO_CFG)
+
+
+UPLOAD_WORKERS = 16
+# Bounds how far parsing can run ahead of the uploads
+UPLOAD_QUEUE_SIZE = 256
+
 
 def ensure_bucket_exists(s3_client, bucket_name: str):
     """Fail if bucket does not exist or is not accessible."""
@@ -14,39 +33,77 @@ def ensure_bucket_exists(s3_client, bucket_name: str):
             f"Details: {e}"
         )
 
-def upload_faq_files(bucket_name: str, faq_json_path: str, prefix: str = ""):
-    with open(faq_json_path, "r") as f:
-        faqs = json.load(f)
+def upload_faq(s3, bucket_name: str, prefix: str, index: int, faq: dict) -> bool:
+    """Upload one FAQ as a text file. Returns False if it was skipped."""
+    question = str(faq.get("Q", "")).strip()
+    answer = str(faq.get("A", "")).strip()
+
+    if not question or not answer:
+        print(f"Skipping FAQ #{index} — missing Q or A.")
+        return False
 
-    if not isinstance(faqs, list):
-        raise ValueError("FAQ JSON must be a list of {Q, A} objects.")
+    content = f"Q: {question}\nA: {answer}\n"
+    filename = f"faq{index}.txt"
+    s3_key = f"{prefix}{filename}"
 
-    s3 = session.client("s3")
+    s3.put_object(
+        Bucket=bucket_name,
+        Key=s3_key,
+        Body=content.encode("utf-8"),
+        ContentType="text/plain",
+    )
+
+    print(f"Uploaded: s3://{bucket_name}/{s3_key}")
+    return True
+
+
+def upload_faq_files(bucket_name: str, faq_json_path: str, prefix: str = ""):
+    s3 = get_s3_client()
     ensure_bucket_exists(s3, bucket_name)
 
+    # FAQs are parsed incrementally and handed to upload workers through a
+    # bounded queue, so memory stays flat and uploads start immediately
+    work: queue.Queue = queue.Queue(maxsize=UPLOAD_QUEUE_SIZE)
+    lock = threading.Lock()
     uploaded = 0
+    errors: list[Exception] = []
 
-    for i, faq in enumerate(faqs, start=1):
-        question = str(faq.get("Q", "")).strip()
-        answer = str(faq.get("A", "")).strip()
+    def worker():
+        nonlocal uploaded
+        while (item := work.get()) is not None:
+            index, faq = item
+            if errors:
+                continue
+            try:
+                if upload_faq(s3, bucket_name, prefix, index, faq):
+                    with lock:
+                        uploaded += 1
+            except Exception as e:
+                errors.append(e)
 
-        if not question or not answer:
-            print(f"Skipping FAQ #{i} — missing Q or A.")
-            continue
+    workers = [threading.Thread(target=worker) for _ in range(UPLOAD_WORKERS)]
+    for t in workers:
+        t.start()
 
-        content = f"Q: {question}\nA: {answer}\n"
-        filename = f"faq{i}.txt"
-        s3_key = f"{prefix}{filename}"
+    try:
+        with open(faq_json_path, "rb") as f:
+            events = ijson.parse(f, use_float=True)
+            first = next(events, None)
+            if first is None or first[1] != "start_array":
+                raise ValueError("FAQ JSON must be a list of {Q, A} objects.")
 
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=s3_key,
-            Body=content.encode("utf-8"),
-            ContentType="text/plain",
-        )
+            for i, faq in enumerate(ijson.items(events, "item"), start=1):
+                if errors:
+                    break
+                work.put((i, faq))
+    finally:
+        for _ in workers:
+            work.put(None)
+        for t in workers:
+            t.join()
 
-        print(f"Uploaded: s3://{bucket_name}/{s3_key}")
-        uploaded += 1
+    if errors:
+        raise errors[0]
 
     print(f"\n✅ Uploaded {uploaded} FAQs successfully!")
 
@@ -59,7 +116,4 @@ if __name__ == "__main__":
     parser.add_argument("--file", required=True, help="Path to the FAQ JSON file")
     args = parser.parse_args()
 
-    session = boto3.session.Session()
-    region = session.region_name
-
     upload_faq_files(args.bucket, args.file)
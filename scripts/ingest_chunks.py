@@ -10,18 +10,40 @@ python3 ingest_chunks.py \
 
 import os
 import json
+import functools
 import boto3
 import argparse
 import botocore
+from botocore.config import Config
+import heapq
+import threading
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pdf_chunking.pdfChunker import process_pdf_from_s3
 
 # === AWS CONFIG ===
-s3 = boto3.client("s3")
-session = boto3.session.Session()
-REGION_NAME = session.region_name
+# One client is shared by all worker threads, so the pool is sized above MAX_WORKERS
+_BOTO_CFG = Config(retries={"max_attempts": 10, "mode": "adaptive"}, max_pool_connections=64)
 
-LOG_FILE = "chunk_upload_summary.json"
+
+@functools.cache
+def get_s3_client():
+    """Return the S3 client shared by every call in this script."""
+    return boto3.client("s3", config=_BOTO_CFG)
+
+
+LOG_FILE = "chunk_upload_summary.jsonl"
+_log_lock = threading.Lock()
+
+# PDFs processed concurrently; each one mostly waits on Textract and S3
+MAX_WORKERS = 8
+
+# Textract scratch paths (/tmp/pdf/<stem>.pdf, textract-output/<stem>/) are named
+# by file stem, so PDFs sharing a stem are queued here and run one after another
+_stem_queues: dict[str, deque[tuple[str, bool]]] = {}
+_stem_lock = threading.Lock()
 
 # === HELPERS ===
 def ensure_bucket_exists(s3_client, bucket_name: str):
@@ -34,22 +56,38 @@ def ensure_bucket_exists(s3_client, bucket_name: str):
             f"Use the exact bucket name created by CDK.\n"
             f"Details: {e}"
         )
-def list_all_pdfs(bucket: str, prefix: str = "sources/") -> list:
-    """List all PDFs in the source bucket."""
-    pdfs = []
-    paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            key = obj["Key"]
-            if key.lower().endswith(".pdf"):
-                pdfs.append(key)
-    return pdfs
+def list_all_pdfs(bucket: str, prefix: str = "sources/") -> Iterator[tuple[str, bool]]:
+    """Yield (pdf_key, has_metadata) for each PDF as the listing arrives.
+
+    S3 lists keys in ascending order, so a PDF's "<key>.metadata.json" sidecar
+    always sorts after it. Each PDF is held back only until the listing passes
+    the point where its sidecar would appear. Sidecars don't sort in PDF order
+    ("x.pdf (1).pdf.metadata.json" comes before "x.pdf.metadata.json"), so the
+    held-back PDFs are kept in a heap keyed by sidecar name.
+    """
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    pages = paginator.paginate(
+        Bucket=bucket, Prefix=prefix, PaginationConfig={"PageSize": 1000}
+    )
+    pending: list[tuple[str, str]] = []  # heap of (meta_key, pdf_key)
+    # Project each page down to its keys; empty pages yield None
+    for key in pages.search("Contents[].Key"):
+        if not key:
+            continue
+        while pending and pending[0][0] < key:
+            yield heapq.heappop(pending)[1], False
+        if pending and pending[0][0] == key:
+            yield heapq.heappop(pending)[1], True
+        if key.lower().endswith(".pdf"):
+            heapq.heappush(pending, (key + ".metadata.json", key))
+    while pending:
+        yield heapq.heappop(pending)[1], False
 
 
 def get_metadata(bucket: str, key: str):
     """Fetch metadata.json and return (url, source_id)."""
     try:
-        obj = s3.get_object(Bucket=bucket, Key=key)
+        obj = get_s3_client().get_object(Bucket=bucket, Key=key)
         data = json.loads(obj["Body"].read())
         meta = data.get("metadataAttributes", {})
         source_url = data.get("source_url") or data.get("url") or meta.get("url") or "n/a"
@@ -61,16 +99,10 @@ def get_metadata(bucket: str, key: str):
 
 
 def log_pdf_summary(entry):
-    """Append PDF-level summary to a local JSON log file."""
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r") as f:
-            logs = json.load(f)
-    else:
-        logs = []
-
-    logs.append(entry)
-    with open(LOG_FILE, "w") as f:
-        json.dump(logs, f, indent=2)
+    """Append PDF-level summary as one line to a local JSON Lines log file."""
+    line = json.dumps(entry) + "\n"
+    with _log_lock, open(LOG_FILE, "a") as f:
+        f.write(line)
 
 
 def upload_chunk(chunk: dict, index: int, pdf_key: str):
@@ -79,6 +111,7 @@ def upload_chunk(chunk: dict, index: int, pdf_key: str):
     base_name = os.path.splitext(os.path.basename(doc_id))[0].replace(" ", "_")
     chunk_name = f"{base_name}_chunk_{index:03d}"
     meta_key = f"{chunk_name}.metadata.json"
+    s3 = get_s3_client()
 
     # Upload the text chunk (no file extension)
     s3.put_object(
@@ -101,11 +134,16 @@ def upload_chunk(chunk: dict, index: int, pdf_key: str):
     return chunk_name
 
 
-def process_and_upload_pdf(pdf_key: str):
+def process_and_upload_pdf(pdf_key: str, has_metadata: bool = True):
     """Process one PDF, chunk it, and upload all chunks."""
     print(f"\n📄 Processing {pdf_key}")
     meta_key = pdf_key + ".metadata.json"
-    source_url, source_id = get_metadata(SOURCE_BUCKET, meta_key)
+    if has_metadata:
+        source_url, source_id = get_metadata(SOURCE_BUCKET, meta_key)
+    else:
+        # The listing showed no sidecar, so skip the GET that would miss
+        print(f"⚠️ No metadata.json found for {meta_key}, defaulting to 'n/a'")
+        source_url, source_id = "n/a", "n/a"
 
     start_time = datetime.utcnow().isoformat() + "Z"
     try:
@@ -150,6 +188,50 @@ def process_and_upload_pdf(pdf_key: str):
     print(f"🚀 Uploaded {uploaded}/{len(chunks)} chunks for {pdf_key}")
 
 
+def process_pdf_safely(pdf_key: str, has_metadata: bool):
+    """Process one PDF, logging any unexpected failure instead of raising."""
+    try:
+        process_and_upload_pdf(pdf_key, has_metadata)
+    except Exception as e:
+        print(f"❌ Error processing {pdf_key}: {e}")
+        log_pdf_summary({
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "pdf_key": pdf_key,
+            "chunks_extracted": 0,
+            "chunks_uploaded": 0,
+            "status": "failed",
+            "error": str(e)
+        })
+
+
+def enqueue_pdf(pdf_key: str, has_metadata: bool) -> str | None:
+    """Queue a PDF behind others with the same stem.
+
+    Returns the stem if it needs a new worker, or None if one is already
+    draining that stem's queue and will pick this PDF up.
+    """
+    stem = os.path.splitext(os.path.basename(pdf_key))[0]
+    with _stem_lock:
+        queue = _stem_queues.get(stem)
+        if queue is not None:
+            queue.append((pdf_key, has_metadata))
+            return None
+        _stem_queues[stem] = deque([(pdf_key, has_metadata)])
+    return stem
+
+
+def process_stem_queue(stem: str):
+    """Process queued PDFs for one stem in order until the queue is empty."""
+    while True:
+        with _stem_lock:
+            queue = _stem_queues[stem]
+            if not queue:
+                del _stem_queues[stem]
+                return
+            pdf_key, has_metadata = queue.popleft()
+        process_pdf_safely(pdf_key, has_metadata)
+
+
 # === MAIN ===
 def main():
     parser = argparse.ArgumentParser(description="Run custom chunking on PDFs in S3")
@@ -167,25 +249,24 @@ def main():
     SOURCE_BUCKET = args.source_bucket
     DEST_BUCKET = args.dest_bucket
 
-    ensure_bucket_exists(s3, DEST_BUCKET)
+    ensure_bucket_exists(get_s3_client(), DEST_BUCKET)
 
     print(f"🔍 Listing PDFs in {SOURCE_BUCKET}/{args.prefix}")
-    pdf_keys = list_all_pdfs(SOURCE_BUCKET, args.prefix)
-    print(f"Found {len(pdf_keys)} PDFs to process.\n")
 
-    for pdf_key in pdf_keys:
-        try:
-            process_and_upload_pdf(pdf_key)
-        except Exception as e:
-            print(f"❌ Error processing {pdf_key}: {e}")
-            log_pdf_summary({
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "pdf_key": pdf_key,
-                "chunks_extracted": 0,
-                "chunks_uploaded": 0,
-                "status": "failed",
-                "error": str(e)
-            })
+    # Listing and processing overlap: workers start on the first PDFs while
+    # later pages are still being listed
+    processed = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = []
+        for pdf_key, has_metadata in list_all_pdfs(SOURCE_BUCKET, args.prefix):
+            processed += 1
+            stem = enqueue_pdf(pdf_key, has_metadata)
+            if stem is not None:
+                futures.append(executor.submit(process_stem_queue, stem))
+        for future in futures:
+            future.result()
+
+    print(f"\nProcessed {processed} PDFs.")
 
 
 if __name__ == "__main__":
@@ -12,13 +12,50 @@ python3 ingest.py \
   --input-file documents/document_descs.json
 """
 
+import asyncio
 import boto3
+import functools
 import json
 import argparse
-import requests
+import httpx
+import string
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
-from pathlib import Path
 import botocore
+from botocore.config import Config
+
+CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".txt": "text/plain",
+    ".html": "text/html",
+    ".json": "application/json",
+}
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+DELETE_WORKERS = 16
+
+# Listing is split into key ranges at these characters (after the prefix) and
+# the ranges are listed in parallel. The ranges cover the whole key space, so
+# keys outside this alphabet are still found; it only affects how evenly the
+# work is spread.
+LIST_SHARD_SPLITS = string.digits + string.ascii_lowercase
+LIST_WORKERS = 16
+
+# Documents downloaded at once, and threads uploading the downloaded bytes
+DOWNLOAD_CONCURRENCY = 32
+UPLOAD_WORKERS = 16
+
+# Pool covers the parallel listings and deletes; adaptive retries ride out throttling
+_BOTO_CFG = Config(retries={"max_attempts": 10, "mode": "adaptive"}, max_pool_connections=64)
+
+
+@functools.cache
+def get_s3_client():
+    """Return the S3 client shared by every call in this script."""
+    return boto3.client("s3", config=_BOTO_CFG)
+
 
 def ensure_bucket_exists(s3_client, bucket_name: str, region: str):
     try:
@@ -33,9 +70,10 @@ def ensure_bucket_exists(s3_client, bucket_name: str, region: str):
             }
         )
 
-def download_file(url: str) -> bytes:
+async def download_file(client: httpx.AsyncClient, url: str) -> bytes:
     """Download file from URL"""
-    response = requests.get(url, timeout=30)
+    # The 30s limit covers the transfer itself, not waiting for a free connection
+    response = await client.get(url, timeout=httpx.Timeout(30, pool=None))
     response.raise_for_status()
     return response.content
 
@@ -51,29 +89,133 @@ def upload_to_s3(
     s3_client.put_object(Bucket=bucket, Key=key, Body=data, **extra_args)
 
 
+def delete_batch(s3_client, bucket: str, batch: list[dict]) -> int:
+    """Delete one batch of keys and return how many were deleted"""
+    response = s3_client.delete_objects(
+        Bucket=bucket, Delete={"Objects": batch, "Quiet": True}
+    )
+    # Quiet mode only reports the keys that failed
+    errors = response.get("Errors", [])
+    for error in errors:
+        print(f"  ❌ Failed to delete {error['Key']}: {error.get('Message')}")
+    return len(batch) - len(errors)
+
+
+def list_key_range(
+    s3_client, bucket: str, prefix: str, start_after: str | None, end_at: str | None
+) -> Iterator[str]:
+    """Yield keys under prefix that sort after start_after and up to end_at"""
+    paginator = s3_client.get_paginator("list_objects_v2")
+    params = {"Bucket": bucket, "Prefix": prefix, "PaginationConfig": {"PageSize": 1000}}
+    if start_after is not None:
+        params["StartAfter"] = start_after
+
+    # Project each page down to its keys; empty pages yield None
+    for key in paginator.paginate(**params).search("Contents[].Key"):
+        if not key:
+            continue
+        # Keys arrive in ascending order, so stop paging once past the range
+        if end_at is not None and key > end_at:
+            return
+        yield key
+
+
 def clear_bucket(s3_client, bucket: str, prefix: str = ""):
     """Clear all objects in bucket with given prefix"""
     print(f"️ Clearing bucket s3://{bucket}/{prefix}...")
 
-    # List all objects with the prefix
-    paginator = s3_client.get_paginator("list_objects_v2")
-    pages = paginator.paginate(Bucket=bucket, Prefix=prefix)
-
-    objects_to_delete = []
-    for page in pages:
-        if "Contents" in page:
-            objects_to_delete.extend([{"Key": obj["Key"]} for obj in page["Contents"]])
-
-    if objects_to_delete:
-        # Delete objects in batches of 1000 (S3 limit)
-        for i in range(0, len(objects_to_delete), 1000):
-            batch = objects_to_delete[i : i + 1000]
-            s3_client.delete_objects(Bucket=bucket, Delete={"Objects": batch})
-        print(f"  ✅ Deleted {len(objects_to_delete)} objects")
+    bounds = [None] + [prefix + c for c in LIST_SHARD_SPLITS] + [None]
+
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as delete_pool:
+
+        def clear_range(start_after: str | None, end_at: str | None) -> list:
+            # Hand each full batch to the delete pool as soon as it is listed,
+            # so deletes overlap with pagination
+            futures = []
+            batch = []
+            for key in list_key_range(s3_client, bucket, prefix, start_after, end_at):
+                batch.append({"Key": key})
+                if len(batch) == DELETE_BATCH_SIZE:
+                    futures.append(delete_pool.submit(delete_batch, s3_client, bucket, batch))
+                    batch = []
+            if batch:
+                futures.append(delete_pool.submit(delete_batch, s3_client, bucket, batch))
+            return futures
+
+        with ThreadPoolExecutor(max_workers=LIST_WORKERS) as list_pool:
+            ranges = [
+                list_pool.submit(clear_range, start_after, end_at)
+                for start_after, end_at in zip(bounds[:-1], bounds[1:])
+            ]
+            futures = [future for listed in ranges for future in listed.result()]
+
+        deleted = sum(future.result() for future in futures)
+
+    if futures:
+        print(f"  ✅ Deleted {deleted} objects")
     else:
         print(f"  ℹ️ No objects found to delete")
 
 
+def upload_document(s3_client, bucket: str, prefix: str, doc: dict, file_data: bytes):
+    """Upload a downloaded document and its metadata.json (overwrites existing)"""
+    doc_id = doc["documentId"]
+    metadata = doc["metadata"]
+    url = metadata["url"]
+
+    # Determine filename from URL and use source ID with extension
+    original_filename = urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+    if not original_filename:
+        original_filename = f"{doc_id}.pdf"
+
+    # Get file extension from original filename
+    file_extension = get_suffix(original_filename)
+    if not file_extension:
+        file_extension = ".pdf"  # Default to PDF if no extension found
+
+    # Use source ID with appropriate extension
+    filename = f"{doc_id}{file_extension}"
+
+    # Upload document
+    doc_key = f"{prefix}{doc_id}/{filename}"
+    content_type = get_content_type(filename)
+    upload_to_s3(s3_client, bucket, doc_key, file_data, content_type)
+    print(f"  ✅ Uploaded document: s3://{bucket}/{doc_key}")
+
+    # Upload metadata
+    metadata_key = f"{prefix}{doc_id}/{filename}.metadata.json"
+    wrapped_metadata = {"metadataAttributes": metadata}
+    metadata_data = json.dumps(wrapped_metadata, indent=2).encode("utf-8")
+    upload_to_s3(s3_client, bucket, metadata_key, metadata_data, "application/json")
+    print(f"  ✅ Uploaded metadata: s3://{bucket}/{metadata_key}")
+
+
+async def ingest_documents(s3_client, bucket: str, prefix: str, documents: list[dict]):
+    """Download all documents concurrently and upload each one as it arrives"""
+    loop = asyncio.get_running_loop()
+    limits = httpx.Limits(max_connections=DOWNLOAD_CONCURRENCY)
+    # Only this many downloads are in flight; the rest wait here instead of in the pool
+    download_slots = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+    # boto3 is blocking, so uploads run on a thread pool to keep the event loop free
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as upload_pool:
+        async with httpx.AsyncClient(http2=True, limits=limits, follow_redirects=True) as client:
+
+            async def process(doc: dict):
+                doc_id = doc["documentId"]
+                print(f"Processing {doc_id}...")
+                try:
+                    async with download_slots:
+                        file_data = await download_file(client, doc["metadata"]["url"])
+                    await loop.run_in_executor(
+                        upload_pool, upload_document, s3_client, bucket, prefix, doc, file_data
+                    )
+                except Exception as e:
+                    print(f"  ❌ Failed to process {doc_id}: {str(e)}")
+
+            await asyncio.gather(*(process(doc) for doc in documents))
+
+
 def sync_knowledge_base(s3_client, bucket: str, prefix: str, input_file: str):
     """Re-sync knowledge base with fresh data (without clearing bucket)"""
     print(" Starting knowledge base sync...")
@@ -84,61 +226,23 @@ def sync_knowledge_base(s3_client, bucket: str, prefix: str, input_file: str):
         documents = json.load(f)
 
     print(f"📤 Uploading {len(documents)} documents...")
-    for doc in documents:
-        doc_id = doc["documentId"]
-        metadata = doc["metadata"]
-        url = metadata["url"]
-
-        print(f"Processing {doc_id}...")
-
-        try:
-            # Download file
-            file_data = download_file(url)
-
-            # Determine filename from URL and use source ID with extension
-            original_filename = Path(urlparse(url).path).name
-            if not original_filename:
-                original_filename = f"{doc_id}.pdf"
-
-            # Get file extension from original filename
-            file_extension = Path(original_filename).suffix
-            if not file_extension:
-                file_extension = ".pdf"  # Default to PDF if no extension found
-
-            # Use source ID with appropriate extension
-            filename = f"{doc_id}{file_extension}"
-
-            # Upload document (will overwrite existing)
-            doc_key = f"{prefix}{doc_id}/{filename}"
-            content_type = get_content_type(filename)
-            upload_to_s3(s3_client, bucket, doc_key, file_data, content_type)
-            print(f"  ✅ Uploaded document: s3://{bucket}/{doc_key}")
-
-            # Upload metadata (will overwrite existing)
-            metadata_key = f"{prefix}{doc_id}/{filename}.metadata.json"
-            wrapped_metadata = {"metadataAttributes": metadata}
-            metadata_data = json.dumps(wrapped_metadata, indent=2).encode("utf-8")
-            upload_to_s3(
-                s3_client, bucket, metadata_key, metadata_data, "application/json"
-            )
-            print(f"  ✅ Uploaded metadata: s3://{bucket}/{metadata_key}")
-
-        except Exception as e:
-            print(f"  ❌ Failed to process {doc_id}: {str(e)}")
+    asyncio.run(ingest_documents(s3_client, bucket, prefix, documents))
 
     print("✅ Knowledge base sync completed!")
 
 
+def get_suffix(filename: str) -> str:
+    """Get the extension of a filename, matching pathlib's Path.suffix"""
+    i = filename.rfind(".")
+    # No suffix for dotfiles (".env") or names ending in a dot ("file.")
+    if 0 < i < len(filename) - 1:
+        return filename[i:]
+    return ""
+
+
 def get_content_type(filename: str) -> str:
     """Get content type based on file extension"""
-    ext = Path(filename).suffix.lower()
-    content_types = {
-        ".pdf": "application/pdf",
-        ".txt": "text/plain",
-        ".html": "text/html",
-        ".json": "application/json",
-    }
-    return content_types.get(ext, "application/octet-stream")
+    return CONTENT_TYPES.get(get_suffix(filename).lower(), "application/octet-stream")
 
 
 def main():
@@ -157,9 +261,8 @@ def main():
     args = parser.parse_args()
 
     # Initialize S3 client
-    session = boto3.session.Session()
-    region = session.region_name
-    s3_client = session.client("s3")
+    s3_client = get_s3_client()
+    region = s3_client.meta.region_name
 
     # Ensure bucket exists
     ensure_bucket_exists(s3_client, args.bucket, region)
@@ -177,47 +280,7 @@ def main():
     with open(args.input_file, "r") as f:
         documents = json.load(f)
 
-    for doc in documents:
-        doc_id = doc["documentId"]
-        metadata = doc["metadata"]
-        url = metadata["url"]
-
-        print(f"Processing {doc_id}...")
-
-        try:
-            # Download file
-            file_data = download_file(url)
-
-            # Determine filename from URL and use source ID with extension
-            original_filename = Path(urlparse(url).path).name
-            if not original_filename:
-                original_filename = f"{doc_id}.pdf"
-
-            # Get file extension from original filename
-            file_extension = Path(original_filename).suffix
-            if not file_extension:
-                file_extension = ".pdf"  # Default to PDF if no extension found
-
-            # Use source ID with appropriate extension
-            filename = f"{doc_id}{file_extension}"
-
-            # Upload document
-            doc_key = f"{args.prefix}{doc_id}/{filename}"
-            content_type = get_content_type(filename)
-            upload_to_s3(s3_client, args.bucket, doc_key, file_data, content_type)
-            print(f"  ✅ Uploaded document: s3://{args.bucket}/{doc_key}")
-
-            # Upload metadata
-            metadata_key = f"{args.prefix}{doc_id}/{filename}.metadata.json"
-            wrapped_metadata = {"metadataAttributes": metadata}
-            metadata_data = json.dumps(wrapped_metadata, indent=2).encode("utf-8")
-            upload_to_s3(
-                s3_client, args.bucket, metadata_key, metadata_data, "application/json"
-            )
-            print(f"  ✅ Uploaded metadata: s3://{args.bucket}/{metadata_key}")
-
-        except Exception as e:
-            print(f"  ❌ Failed to process {doc_id}: {str(e)}")
+    asyncio.run(ingest_documents(s3_client, args.bucket, args.prefix, documents))
 
 
 if __name__ == "__main__":
@@ -2,24 +2,44 @@ import argparse
 import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
 
 DEFAULT_OUTPUT_PATH = "documents/faqs.json"
 
+HUB_CONTENT_ID = "ctl00_PlaceHolderMain_ctl01__ControlWrapper_RichHtmlField"
+
+# Parse only the subtrees each step reads; lxml does the tokenizing in C
+HUB_CONTENT_STRAINER = SoupStrainer(id=HUB_CONTENT_ID)
+FAQ_LIST_STRAINER = SoupStrainer(["ol", "ul"])
+
+MULTI_NEWLINE_RE = re.compile(r"\n{2,}")
+
+# FAQ pages fetched concurrently
+CRAWL_WORKERS = 16
+
+# One keep-alive session for the whole crawl; the pool covers every worker
+SESSION = requests.Session()
+SESSION.headers["User-Agent"] = "Mozilla/5.0"
+SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
 def is_probably_html_page(url: str) -> bool:
     """Skip obvious non-HTML docs (pdf, doc, etc)."""
     path = urlparse(url).path.lower()
     return not any(path.endswith(ext) for ext in [".pdf", ".doc", ".docx", ".xls", ".xlsx"])
 
 
-def fetch_soup(url: str, timeout: int = 30) -> BeautifulSoup | None:
+def fetch_soup(
+    url: str, timeout: int = 30, parse_only: SoupStrainer | None = None
+) -> BeautifulSoup | None:
     try:
-        resp = requests.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
+        resp = SESSION.get(url, timeout=timeout)
         resp.raise_for_status()
-        return BeautifulSoup(resp.text, "html.parser")
+        return BeautifulSoup(resp.text, "lxml", parse_only=parse_only)
     except requests.RequestException as e:
         print(f"[ERROR] Fetch failed: {url} :: {e}")
         return None
@@ -34,11 +54,11 @@ def extract_nested_links(hub_url: str) -> list[str]:
     """
     print(f"[INFO] Fetching hub page: {hub_url}")
 
-    resp = requests.get(hub_url, headers={"User-Agent": "Mozilla/5.0"})
+    resp = SESSION.get(hub_url)
     resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+    soup = BeautifulSoup(resp.text, "lxml", parse_only=HUB_CONTENT_STRAINER)
 
-    content = soup.find("div", id="ctl00_PlaceHolderMain_ctl01__ControlWrapper_RichHtmlField")
+    content = soup.find("div", id=HUB_CONTENT_ID)
     if not content:
         raise RuntimeError("Could not find main FAQ content container")
 
@@ -102,7 +122,7 @@ def extract_qa_pairs_from_faq_page(page_url: str) -> list[dict]:
 
     Skips pages that appear to be "questions-only" (no <p> answers and no nested lists).
     """
-    soup = fetch_soup(page_url)
+    soup = fetch_soup(page_url, parse_only=FAQ_LIST_STRAINER)
     if not soup:
         return []
 
@@ -153,16 +173,15 @@ def extract_qa_pairs_from_faq_page(page_url: str) -> list[dict]:
                 if t:
                     answer_parts.append(f"- {t}")
 
-        # Fallback: remaining text directly under li
+        # Fallback: remaining text directly under li, unless the parts above
+        # already cover it (only worth joining them when there are any)
         raw = li.get_text("\n", strip=True)
-        raw = re.sub(r"\n{2,}", "\n", raw).strip()
-        if raw:
-            joined = "\n".join(answer_parts)
-            if raw not in joined:
-                answer_parts.append(raw)
+        raw = MULTI_NEWLINE_RE.sub("\n", raw).strip()
+        if raw and (not answer_parts or raw not in "\n".join(answer_parts)):
+            answer_parts.append(raw)
 
-        # De-dupe while preserving order
-        answer = "\n".join(dict.fromkeys([a for a in answer_parts if a])).strip()
+        # De-dupe while preserving order (every part is already non-empty)
+        answer = "\n".join(dict.fromkeys(answer_parts)).strip()
 
         if question and answer:
             qa_pairs.append({"Q": question, "A": answer, "source_url": page_url})
@@ -192,15 +211,18 @@ def main():
     all_qas: list[dict] = []
     total_pages_with_qas = 0
 
-    for idx, link in enumerate(nested_links, start=1):
-        print(f"[INFO] ({idx}/{len(nested_links)}) Crawling: {link}")
-        qas = extract_qa_pairs_from_faq_page(link)
-        if qas:
-            total_pages_with_qas += 1
-            print(f"       Extracted {len(qas)} Q/A")
-            all_qas.extend(qas)
-        else:
-            print("       No Q/A found (skipping)")
+    with ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as executor:
+        # map yields results in link order, so the combined output is unchanged
+        results = executor.map(extract_qa_pairs_from_faq_page, nested_links)
+
+        for idx, (link, qas) in enumerate(zip(nested_links, results), start=1):
+            print(f"[INFO] ({idx}/{len(nested_links)}) Crawled: {link}")
+            if qas:
+                total_pages_with_qas += 1
+                print(f"       Extracted {len(qas)} Q/A")
+                all_qas.extend(qas)
+            else:
+                print("       No Q/A found (skipping)")
 
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
 
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 import argparse
+import functools
 import json
 import os
+import random
+import time
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 FAQ_SOURCE_BUCKET = "wis-faq-bucket"
@@ -11,10 +15,25 @@ SOURCE_ACCOUNT_ID = "285396213403"
 CDK_STACK_NAME = "WisconsinBotStack"
 DEFAULT_ROLE_NAME = "CrossAccountS3SyncRole"
 
+# Adaptive retries back off on IAM/CloudFormation throttling instead of failing
+_BOTO_CFG = Config(
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    max_pool_connections=32,
+    connect_timeout=5,
+    read_timeout=30,
+)
 
+
+@functools.cache
+def get_session() -> boto3.Session:
+    """Return the shared session so clients reuse one credential chain and model loader."""
+    return boto3.Session()
+
+
+@functools.cache
 def get_region() -> str:
     region = (
-        boto3.Session().region_name
+        get_session().region_name
         or os.environ.get("AWS_REGION")
         or os.environ.get("AWS_DEFAULT_REGION")
     )
@@ -23,14 +42,69 @@ def get_region() -> str:
     return region
 
 
+@functools.cache
+def get_client(service: str):
+    """Return the shared client for an AWS service, created on first use."""
+    return get_session().client(service, region_name=get_region(), config=_BOTO_CFG)
+
+
+@functools.cache
+def get_account_id() -> str:
+    """Return the caller's account ID, asking STS only once."""
+    return get_client("sts").get_caller_identity()["Account"]
+
+
+def retry(
+    fn,
+    *,
+    retriable=("NoSuchEntity", "MalformedPolicyDocument", "Throttling"),
+    max_attempts: int = 6,
+    base: float = 1.0,
+    cap: float = 30.0,
+):
+    """Call fn, retrying with jittered exponential backoff on the given error codes.
+
+    IAM is eventually consistent: a role can briefly be missing right after
+    creation, and the account throttles bursts of control-plane calls.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code not in retriable or attempt == max_attempts - 1:
+                raise
+            delay = min(cap, base * 2**attempt) * (1 + random.random() * 0.5)
+            print(f"  {code}, retrying in {delay:.1f}s ({attempt + 1}/{max_attempts - 1})...")
+            time.sleep(delay)
+
+
+@functools.lru_cache(maxsize=4)
+def get_stack_exports(stack_name: str) -> dict[str, str]:
+    """Map a stack's export names to their values (listed once per stack).
+
+    list_exports returns only name/value/stack-id triples, far smaller than a
+    full describe_stacks, and the JMESPath filter keeps just this stack's.
+    """
+    paginator = get_client("cloudformation").get_paginator("list_exports")
+    stack_marker = f":stack/{stack_name}/"
+    query = f"Exports[?contains(ExportingStackId, '{stack_marker}')].[Name, Value]"
+    return dict(pair for pair in paginator.paginate().search(query) if pair)
+
+
 def get_bucket_from_cdk_output(export_name: str) -> str:
-    cf = boto3.client("cloudformation", region_name=get_region())
-    resp = cf.describe_stacks(StackName=CDK_STACK_NAME)
-    outputs = resp["Stacks"][0].get("Outputs", [])
-    for output in outputs:
-        if output.get("ExportName") == export_name:
-            return output["OutputValue"]
-    raise ValueError(f"Could not find CDK output with ExportName={export_name}")
+    exports = get_stack_exports(CDK_STACK_NAME)
+    if export_name not in exports:
+        raise ValueError(f"Could not find CDK output with ExportName={export_name}")
+    return exports[export_name]
+
+
+def parse_pair(value: str) -> tuple[str, str, str]:
+    """Parse a --pair argument of the form LABEL:SRC:DST."""
+    parts = tuple(value.split(":"))
+    if len(parts) != 3 or not all(parts):
+        raise argparse.ArgumentTypeError(f"expected LABEL:SRC:DST, got {value!r}")
+    return parts
 
 
 def main():
@@ -65,6 +139,14 @@ def main():
         "--rag-dest-bucket",
         help="Name of the DESTINATION RAG S3 bucket (default: read from CDK stack output).",
     )
+    parser.add_argument(
+        "--pair",
+        action="append",
+        default=[],
+        type=parse_pair,
+        metavar="LABEL:SRC:DST",
+        help="Extra source/destination bucket pair to grant access to (repeatable).",
+    )
     parser.add_argument(
         "--policy-name",
         default="CrossAccountS3SyncPolicy",
@@ -79,10 +161,13 @@ def main():
         "WisconsinBot-RagBucketName"
     )
 
-    iam = boto3.client("iam", region_name=get_region())
+    iam = get_client("iam")
 
     source_buckets = [args.faq_source_bucket, args.rag_source_bucket]
     dest_buckets = [faq_dest_bucket, rag_dest_bucket]
+    for _label, source, dest in args.pair:
+        source_buckets.append(source)
+        dest_buckets.append(dest)
 
     trust_policy = {
         "Version": "2012-10-17",
@@ -95,21 +180,31 @@ def main():
             }
         ],
     }
+    # Serialized once; shared by create/update and reused across retries
+    trust_policy_json = json.dumps(trust_policy)
 
     try:
         print(f"Creating role {args.role_name}...")
-        iam.create_role(
-            RoleName=args.role_name,
-            AssumeRolePolicyDocument=json.dumps(trust_policy),
-            Description=f"Cross-account S3 sync role for FAQ and RAG buckets",
+        retry(
+            lambda: iam.create_role(
+                RoleName=args.role_name,
+                AssumeRolePolicyDocument=trust_policy_json,
+                Description=f"Cross-account S3 sync role for FAQ and RAG buckets",
+            )
+        )
+        # Wait until IAM can see the new role before attaching its policy
+        iam.get_waiter("role_exists").wait(
+            RoleName=args.role_name, WaiterConfig={"Delay": 2, "MaxAttempts": 10}
         )
         print(f"Role {args.role_name} created.")
     except ClientError as e:
         if e.response["Error"]["Code"] == "EntityAlreadyExists":
             print(f"Role {args.role_name} already exists, updating trust policy.")
-            iam.update_assume_role_policy(
-                RoleName=args.role_name,
-                PolicyDocument=json.dumps(trust_policy),
+            retry(
+                lambda: iam.update_assume_role_policy(
+                    RoleName=args.role_name,
+                    PolicyDocument=trust_policy_json,
+                )
             )
         else:
             raise
@@ -143,18 +238,19 @@ def main():
             },
         ],
     }
+    policy_doc_json = json.dumps(policy_doc)
 
     print(f"Putting inline policy {args.policy_name} on role {args.role_name}...")
-    iam.put_role_policy(
-        RoleName=args.role_name,
-        PolicyName=args.policy_name,
-        PolicyDocument=json.dumps(policy_doc),
+    retry(
+        lambda: iam.put_role_policy(
+            RoleName=args.role_name,
+            PolicyName=args.policy_name,
+            PolicyDocument=policy_doc_json,
+        )
     )
     print("Done.\n")
 
-    sts = boto3.client("sts", region_name=get_region())
-    acct_id = sts.get_caller_identity()["Account"]
-    role_arn = f"arn:aws:iam::{acct_id}:role/{args.role_name}"
+    role_arn = f"arn:aws:iam::{get_account_id()}:role/{args.role_name}"
     print("Use this role ARN in the source account script:")
     print(f"  {role_arn}")
 
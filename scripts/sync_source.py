@@ -1,102 +1,325 @@
 #!/usr/bin/env python3
 import argparse
+import functools
 import json
+import os
+import random
+import select
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+# Adaptive retries back off on S3/STS throttling instead of failing
+_BOTO_CFG = Config(
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    max_pool_connections=32,
+    connect_timeout=5,
+    read_timeout=30,
+)
 
-def apply_bucket_policy(source_bucket: str, dest_role_arn: str):
-    s3 = boto3.client("s3")
 
-    bucket_policy = {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Sid": "AllowDestRoleListBucket",
-                "Effect": "Allow",
-                "Principal": {"AWS": dest_role_arn},
-                "Action": ["s3:ListBucket"],
-                "Resource": f"arn:aws:s3:::{source_bucket}",
-            },
-            {
-                "Sid": "AllowDestRoleReadObjects",
-                "Effect": "Allow",
-                "Principal": {"AWS": dest_role_arn},
-                "Action": ["s3:GetObject"],
-                "Resource": f"arn:aws:s3:::{source_bucket}/*",
-            },
-        ],
-    }
+# Parallel server-side copies per bucket pair
+TRANSFER_CONFIG = TransferConfig(max_concurrency=20, multipart_chunksize=16 * 1024 * 1024)
+
+# Conditional copies per pair for --new-only
+COPY_WORKERS = 16
+
+# Connections one pair can hold at once; the sync client's pool is this times the pair count
+PAIR_CONNECTIONS = max(TRANSFER_CONFIG.max_concurrency, COPY_WORKERS)
+
+# Largest object CopyObject can copy in one request
+MAX_COPY_OBJECT_SIZE = 5 * 1024**3
+
+
+@functools.cache
+def get_session() -> boto3.Session:
+    """Return the shared session so clients reuse one credential chain and model loader."""
+    return boto3.Session()
+
+
+@functools.cache
+def get_client(service: str):
+    """Return the shared client for an AWS service, created on first use."""
+    return get_session().client(service, config=_BOTO_CFG)
+
+
+def retry(
+    fn,
+    *,
+    retriable=("MalformedPolicy", "InvalidPrincipal"),
+    max_attempts: int = 6,
+    base: float = 1.0,
+    cap: float = 30.0,
+):
+    """Call fn, retrying with jittered exponential backoff on the given error codes.
+
+    S3 rejects a bucket policy naming a just-created role until the new principal
+    has propagated, which surfaces as MalformedPolicy/InvalidPrincipal.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code not in retriable or attempt == max_attempts - 1:
+                raise
+            delay = min(cap, base * 2**attempt) * (1 + random.random() * 0.5)
+            print(f"  {code}, retrying in {delay:.1f}s ({attempt + 1}/{max_attempts - 1})...")
+            time.sleep(delay)
+
+
+@functools.lru_cache(maxsize=None)
+def build_bucket_policy(source_bucket: str, dest_role_arn: str) -> str:
+    """Return the serialized policy granting the destination role read access to a bucket."""
+    return json.dumps(
+        {
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Sid": "AllowDestRoleListBucket",
+                    "Effect": "Allow",
+                    "Principal": {"AWS": dest_role_arn},
+                    "Action": ["s3:ListBucket"],
+                    "Resource": f"arn:aws:s3:::{source_bucket}",
+                },
+                {
+                    "Sid": "AllowDestRoleReadObjects",
+                    "Effect": "Allow",
+                    "Principal": {"AWS": dest_role_arn},
+                    "Action": ["s3:GetObject"],
+                    "Resource": f"arn:aws:s3:::{source_bucket}/*",
+                },
+            ],
+        }
+    )
+
 
-    policy_str = json.dumps(bucket_policy)
+def apply_bucket_policy(source_bucket: str, dest_role_arn: str):
+    s3 = get_client("s3")
+    policy_str = build_bucket_policy(source_bucket, dest_role_arn)
 
     try:
         print(f"Setting bucket policy on {source_bucket} to allow {dest_role_arn}...")
-        s3.put_bucket_policy(Bucket=source_bucket, Policy=policy_str)
+        retry(lambda: s3.put_bucket_policy(Bucket=source_bucket, Policy=policy_str))
         print("Bucket policy applied.")
     except ClientError as e:
         print(f"Error applying bucket policy: {e}")
         raise
 
 
-def assume_dest_role(dest_role_arn: str, session_name: str = "s3-sync-session"):
-    sts = boto3.client("sts")
+def assume_dest_role(dest_role_arn: str, session_name: str = "s3-sync-session") -> dict:
+    sts = get_client("sts")
     try:
-        resp = sts.assume_role(
-            RoleArn=dest_role_arn,
-            RoleSessionName=session_name,
+        # A role created moments ago in the other account reads as AccessDenied
+        # until it has propagated, so keep trying for roughly half a minute
+        resp = retry(
+            lambda: sts.assume_role(
+                RoleArn=dest_role_arn,
+                RoleSessionName=session_name,
+            ),
+            retriable=("AccessDenied",),
+            max_attempts=5,
+            base=2.0,
         )
     except ClientError as e:
         print(f"Error assuming role {dest_role_arn}: {e}")
         raise
 
-    creds = resp["Credentials"]
+    return resp["Credentials"]  # [web:71][web:72]
+
+
+def list_bucket_objects(s3, bucket: str) -> dict[str, tuple[int, datetime]]:
+    """Map every key in a bucket to its (size, last modified)."""
+    paginator = s3.get_paginator("list_objects_v2")
     return {
-        "AWS_ACCESS_KEY_ID": creds["AccessKeyId"],
-        "AWS_SECRET_ACCESS_KEY": creds["SecretAccessKey"],
-        "AWS_SESSION_TOKEN": creds["SessionToken"],
-    }  # [web:71][web:72]
+        obj["Key"]: (obj["Size"], obj["LastModified"])
+        for page in paginator.paginate(Bucket=bucket, PaginationConfig={"PageSize": 1000})
+        for obj in page.get("Contents", [])
+    }
+
+
+def sync_bucket(s3, label: str, source_bucket: str, dest_bucket: str):
+    """Copy new and changed objects from source to dest, like `aws s3 sync`.
+
+    An object is copied when it is missing from dest, its size differs, or the
+    source copy is newer. Copies are server-side and run in parallel through a
+    transfer manager that shares this script's S3 client.
+    """
+    print(f"[{label}] Listing s3://{source_bucket} and s3://{dest_bucket}...")
+    source_objects = list_bucket_objects(s3, source_bucket)
+    dest_objects = list_bucket_objects(s3, dest_bucket)
+
+    to_copy = []
+    for key, (size, modified) in source_objects.items():
+        dest = dest_objects.get(key)
+        if dest is None or dest[0] != size or dest[1] < modified:
+            to_copy.append(key)
+
+    print(f"[{label}] Copying {len(to_copy)} of {len(source_objects)} objects...")
+    with create_transfer_manager(s3, TRANSFER_CONFIG) as transfer_manager:
+        futures = [
+            transfer_manager.copy(
+                copy_source={"Bucket": source_bucket, "Key": key},
+                bucket=dest_bucket,
+                key=key,
+            )
+            for key in to_copy
+        ]
+        for future in futures:
+            future.result()
+
+    print(f"[{label}] Sync complete.")
+
+
+def copy_if_absent(s3, source_bucket: str, dest_bucket: str, key: str, size: int) -> bool:
+    """Copy one object unless dest already has the key. Returns whether it was copied."""
+    copy_source = {"Bucket": source_bucket, "Key": key}
+    if size > MAX_COPY_OBJECT_SIZE:
+        # Too big for a single CopyObject, so check for the key before a multipart copy
+        try:
+            s3.head_object(Bucket=dest_bucket, Key=key)
+            return False
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                raise
+        s3.copy(copy_source, dest_bucket, key, Config=TRANSFER_CONFIG)
+        return True
+
+    try:
+        # If-None-Match: * makes S3 refuse the write when the key already exists
+        s3.copy_object(Bucket=dest_bucket, Key=key, CopySource=copy_source, IfNoneMatch="*")
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "PreconditionFailed":
+            raise
+        return False
+
+
+def sync_new_objects(s3, label: str, source_bucket: str, dest_bucket: str):
+    """Copy only the keys that dest doesn't have yet, without listing dest.
+
+    Each copy is conditional, so S3 itself skips keys that already exist. Unlike
+    sync_bucket, objects that changed in source are not re-copied.
+    """
+    print(f"[{label}] Copying objects missing from s3://{dest_bucket}...")
+    pages = s3.get_paginator("list_objects_v2").paginate(
+        Bucket=source_bucket, PaginationConfig={"PageSize": 1000}
+    )
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        # Copies start while later source pages are still being listed
+        futures = [
+            executor.submit(
+                copy_if_absent, s3, source_bucket, dest_bucket, obj["Key"], obj["Size"]
+            )
+            for page in pages
+            for obj in page.get("Contents", [])
+        ]
+        copied = sum(future.result() for future in futures)
+
+    print(f"[{label}] Copied {copied} of {len(futures)} objects; sync complete.")
 
 
-def run_sync(source_bucket: str, dest_bucket: str, env_creds: dict | None):
+def run_sync(source_bucket: str, dest_bucket: str, env: dict | None) -> subprocess.Popen:
+    """Start `aws s3 sync` for one bucket pair and return the running process."""
     cmd = [
         "aws",
         "s3",
         "sync",
         f"s3://{source_bucket}",
         f"s3://{dest_bucket}",
+        # Progress redraws with carriage returns, which garble prefixed piped output
+        "--no-progress",
     ]  # [web:38]
 
-    env = None
-    if env_creds:
-        import os
+    print(f"Running: {' '.join(cmd)}")
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
 
+def stream_output(procs: list[tuple[str, subprocess.Popen]]):
+    """Echo the processes' output as it arrives, prefixing each line with its label."""
+    labels = {proc.stdout.fileno(): label for label, proc in procs}
+    partial = dict.fromkeys(labels, b"")
+    while labels:
+        ready, _, _ = select.select(list(labels), [], [])
+        for fd in ready:
+            # Raw reads, since buffered readline() can hold lines select() can't see
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                lines = [partial.pop(fd)] if partial[fd] else []
+            else:
+                *lines, partial[fd] = (partial[fd] + chunk).split(b"\n")
+            for line in lines:
+                print(f"[{labels[fd]}] {line.decode(errors='replace').rstrip()}")
+            if not chunk:
+                del labels[fd]
+
+
+def run_cli_syncs(bucket_pairs: list[tuple[str, str, str]], creds: dict | None):
+    """Sync every pair with the AWS CLI, running the syncs side by side."""
+    env = None
+    if creds:
         env = os.environ.copy()
-        env.update(env_creds)
+        env.update(
+            {
+                "AWS_ACCESS_KEY_ID": creds["AccessKeyId"],
+                "AWS_SECRET_ACCESS_KEY": creds["SecretAccessKey"],
+                "AWS_SESSION_TOKEN": creds["SessionToken"],
+            }
+        )
+
+    procs = []
+    for label, source, dest in bucket_pairs:
+        print(f"\n=== Syncing {label} Bucket ===")
+        procs.append((label, run_sync(source, dest, env)))
+
+    print()
+    stream_output(procs)
+
+    return_codes = []
+    for label, proc in procs:
+        rc = proc.wait()
+        if rc:
+            print(f"{label} sync command failed with exit code {rc}")
+        return_codes.append(rc)
+
+    if any(return_codes):
+        sys.exit(max(return_codes))
 
-    print(f"Running: {' '.join(cmd)}")
-    try:
-        subprocess.check_call(cmd, env=env)
-    except subprocess.CalledProcessError as e:
-        print(f"Sync command failed with exit code {e.returncode}")
-        sys.exit(e.returncode)
+
+def parse_pair(value: str) -> tuple[str, str, str]:
+    """Parse a --pair argument of the form LABEL:SRC:DST."""
+    parts = tuple(value.split(":"))
+    if len(parts) != 3 or not all(parts):
+        raise argparse.ArgumentTypeError(f"expected LABEL:SRC:DST, got {value!r}")
+    return parts
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Grant DEST cross-account role read access to SOURCE buckets and optionally run aws s3 sync."
-    )
-    parser.add_argument(
-        "--faq-source-bucket", required=True, help="Source FAQ S3 bucket name (in this account)."
+        description=(
+            "Grant DEST cross-account role read access to SOURCE buckets "
+            "and optionally sync them."
+        )
     )
-    parser.add_argument("--faq-dest-bucket", required=True, help="Destination FAQ S3 bucket name.")
+    parser.add_argument("--faq-source-bucket", help="Source FAQ S3 bucket name (in this account).")
+    parser.add_argument("--faq-dest-bucket", help="Destination FAQ S3 bucket name.")
+    parser.add_argument("--rag-source-bucket", help="Source RAG S3 bucket name (in this account).")
+    parser.add_argument("--rag-dest-bucket", help="Destination RAG S3 bucket name.")
     parser.add_argument(
-        "--rag-source-bucket", required=True, help="Source RAG S3 bucket name (in this account)."
+        "--pair",
+        action="append",
+        default=[],
+        type=parse_pair,
+        metavar="LABEL:SRC:DST",
+        help="Additional bucket pair to grant access to and sync (repeatable).",
     )
-    parser.add_argument("--rag-dest-bucket", required=True, help="Destination RAG S3 bucket name.")
     parser.add_argument(
         "--dest-role-arn",
         required=True,
@@ -107,38 +330,85 @@ def main():
         action="store_true",
         help="Assume the destination role before running sync.",
     )
+    parser.add_argument(
+        "--legacy-cli",
+        action="store_true",
+        help="Sync by shelling out to `aws s3 sync` instead of copying in-process.",
+    )
+    parser.add_argument(
+        "--new-only",
+        action="store_true",
+        help="Only copy keys missing from the destination, without listing it. "
+        "Objects that changed in the source are not updated.",
+    )
+    parser.add_argument(
+        "--yes", "-y", action="store_true", help="Skip the confirmation prompt and sync."
+    )
     args = parser.parse_args()
+    if args.new_only and args.legacy_cli:
+        parser.error("--new-only cannot be combined with --legacy-cli")
+    # Fail before touching any bucket policy rather than block on a prompt nobody can answer
+    if not args.yes and not sys.stdin.isatty():
+        parser.error("stdin is not a terminal; pass --yes to sync without confirmation")
 
-    bucket_pairs = [
+    named_pairs = [
         ("FAQ", args.faq_source_bucket, args.faq_dest_bucket),
         ("RAG", args.rag_source_bucket, args.rag_dest_bucket),
     ]
+    for label, source, dest in named_pairs:
+        if bool(source) != bool(dest):
+            flag = label.lower()
+            parser.error(f"--{flag}-source-bucket and --{flag}-dest-bucket must be given together")
+    bucket_pairs = [pair for pair in named_pairs if pair[1]] + args.pair
+    if not bucket_pairs:
+        parser.error("no buckets to sync; pass the FAQ/RAG bucket options or --pair")
+    labels = ", ".join(pair[0] for pair in bucket_pairs)
 
-    for label, source, dest in bucket_pairs:
-        print(f"\n=== {label} Bucket ===")
-        apply_bucket_policy(source, args.dest_role_arn)
+    print(f"\n=== Applying bucket policies ({labels}) ===")
+    # Session.client() isn't thread-safe, so create the shared client up front
+    get_client("s3")
+    with ThreadPoolExecutor(max_workers=len(bucket_pairs)) as executor:
+        # list() surfaces the first failure instead of dropping it
+        list(executor.map(lambda p: apply_bucket_policy(p[1], args.dest_role_arn), bucket_pairs))
 
-    answer = (
-        input(
-            f"\nReady to sync FAQ and RAG buckets using role {args.dest_role_arn}. "
-            f"Run sync now? [y/N]: "
+    if not args.yes:
+        answer = (
+            input(
+                f"\nReady to sync {labels} buckets using role {args.dest_role_arn}. "
+                f"Run sync now? [y/N]: "
+            )
+            .strip()
+            .lower()
         )
-        .strip()
-        .lower()
-    )
 
-    if answer != "y":
-        print("Sync skipped.")
-        return
+        if answer != "y":
+            print("Sync skipped.")
+            return
 
-    env_creds = None
+    creds = None
     if args.assume_role:
         print(f"Assuming role {args.dest_role_arn}...")
-        env_creds = assume_dest_role(args.dest_role_arn)
+        creds = assume_dest_role(args.dest_role_arn)
 
-    for label, source, dest in bucket_pairs:
-        print(f"\n=== Syncing {label} Bucket ===")
-        run_sync(source, dest, env_creds)
+    if args.legacy_cli:
+        run_cli_syncs(bucket_pairs, creds)
+    else:
+        session = get_session()
+        if creds:
+            session = boto3.Session(
+                aws_access_key_id=creds["AccessKeyId"],
+                aws_secret_access_key=creds["SecretAccessKey"],
+                aws_session_token=creds["SessionToken"],
+            )
+        # Pairs sync in parallel on this one client, so every pair needs its own share of the pool
+        pool_config = Config(max_pool_connections=len(bucket_pairs) * PAIR_CONNECTIONS)
+        s3 = session.client("s3", config=_BOTO_CFG.merge(pool_config))
+
+        sync = sync_new_objects if args.new_only else sync_bucket
+
+        print()
+        with ThreadPoolExecutor(max_workers=len(bucket_pairs)) as executor:
+            list(executor.map(lambda p: sync(s3, *p), bucket_pairs))
 
     print("\nAll syncs completed.")
 
@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Make the scripts and the repo-root pdf_chunking package importable
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+class FakePageIterator:
+    """Stands in for botocore's PageIterator over pre-built pages."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def search(self, expression):
+        assert expression == "Contents[].Key"
+        for page in self.pages:
+            if not page:
+                # An empty page projects to None, as in botocore
+                yield None
+            yield from page
+
+
+@pytest.fixture
+def ingest_chunks():
+    """Import ingest_chunks without pulling in the Textract chunking stack."""
+    with patch.dict(sys.modules, {"pdf_chunking.pdfChunker": MagicMock()}):
+        sys.modules.pop("ingest_chunks", None)
+        import ingest_chunks
+
+        yield ingest_chunks
+        sys.modules.pop("ingest_chunks", None)
+
+
+def list_pdfs(ingest_chunks, pages):
+    paginator = MagicMock()
+    paginator.paginate.return_value = FakePageIterator(pages)
+    s3 = MagicMock()
+    s3.get_paginator.return_value = paginator
+    with patch.object(ingest_chunks, "get_s3_client", return_value=s3):
+        return dict(ingest_chunks.list_all_pdfs("bucket", "sources/"))
+
+
+def test_list_all_pdfs_matches_sidecars_out_of_pdf_order(ingest_chunks):
+    """A later PDF's sidecar can sort before an earlier PDF's sidecar."""
+    keys = sorted(
+        [
+            "sources/x.pdf",
+            "sources/x.pdf (1).pdf",
+            "sources/x.pdf (1).pdf.metadata.json",
+            "sources/x.pdf.metadata.json",
+        ]
+    )
+
+    assert list_pdfs(ingest_chunks, [keys]) == {
+        "sources/x.pdf": True,
+        "sources/x.pdf (1).pdf": True,
+    }
+
+
+def test_list_all_pdfs_flags_missing_sidecars_across_pages(ingest_chunks):
+    """PDFs without a sidecar are reported once the listing passes it."""
+    pages = [
+        ["sources/a.pdf", "sources/a.pdf (1).pdf"],
+        [],
+        ["sources/a.pdf.metadata.json", "sources/b.pdf", "sources/notes.txt"],
+    ]
+
+    assert list_pdfs(ingest_chunks, pages) == {
+        "sources/a.pdf": True,
+        "sources/a.pdf (1).pdf": False,
+        "sources/b.pdf": False,
+    }
+
+
+def test_pdfs_sharing_a_stem_run_one_at_a_time(ingest_chunks):
+    """Same-stem PDFs share Textract scratch paths, so they must not overlap."""
+    keys = [f"sources/{folder}/report.pdf" for folder in "abcd"] + ["sources/other.pdf"]
+    running: list[str] = []
+    overlaps: list[str] = []
+    processed: list[str] = []
+    lock = threading.Lock()
+
+    def fake_process(pdf_key, has_metadata):
+        stem = os.path.splitext(os.path.basename(pdf_key))[0]
+        with lock:
+            if stem in running:
+                overlaps.append(pdf_key)
+            running.append(stem)
+        time.sleep(0.01)
+        with lock:
+            running.remove(stem)
+            processed.append(pdf_key)
+
+    with patch.object(ingest_chunks, "process_pdf_safely", side_effect=fake_process):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = []
+            for key in keys:
+                stem = ingest_chunks.enqueue_pdf(key, False)
+                if stem is not None:
+                    futures.append(executor.submit(ingest_chunks.process_stem_queue, stem))
+            for future in futures:
+                future.result()
+
+    assert overlaps == []
+    assert sorted(processed) == sorted(keys)
+    assert ingest_chunks._stem_queues == {}
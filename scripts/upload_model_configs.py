@@ -3,29 +3,109 @@
 Script to parse TOML configuration files and upload model configurations to DynamoDB.
 """
 
+from __future__ import annotations
+
 import argparse
-import json
-import os
-import subprocess
+import functools
+import importlib.util
+import logging
+import random
 import sys
-from decimal import Decimal
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+# boto3 and the pydantic models are imported where they're first needed, so
+# --help doesn't pay for either
+if TYPE_CHECKING:
+    import boto3
+    from bedrock_utils import ModelConfig
 
-import boto3
-import toml
-from botocore.exceptions import ClientError
+logger = logging.getLogger(__name__)
 
 # For bedrock_utils
 script_dir = Path(__file__).parent
-bedrock_utils_dir = script_dir.parent / "packages" / "messages" / "lambdas" / "streaming"
-sys.path.insert(0, str(bedrock_utils_dir))
+bedrock_utils_file = (
+    script_dir.parent / "packages" / "messages" / "lambdas" / "streaming" / "bedrock_utils.py"
+)
+lambda_layers_dir = script_dir.parent / "packages" / "shared" / "lambda_layers"
+
+
+def load_module(name: str, path: Path):
+    """Import a module or package straight from its path, without touching sys.path."""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    if path.is_dir():
+        spec = importlib.util.spec_from_file_location(
+            name, path / "__init__.py", submodule_search_locations=[str(path)]
+        )
+    else:
+        spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+@functools.cache
+def load_bedrock_utils():
+    """Load bedrock_utils after registering the Lambda layer packages it imports."""
+    for package in ("websocket_utils", "step_function_types"):
+        load_module(package, lambda_layers_dir / package)
+    return load_module("bedrock_utils", bedrock_utils_file)
+
+
+# Items per BatchWriteItem call, the DynamoDB maximum
+BATCH_WRITE_SIZE = 25
+
+# Attempts per batch before giving up on items DynamoDB left unprocessed
+MAX_BATCH_ATTEMPTS = 10
 
-step_function_types_dir = script_dir.parent / "packages" / "shared" / "lambda_layers"
-sys.path.insert(0, str(step_function_types_dir))
+# Errors that mean "slow down", retried like unprocessed items
+THROTTLING_ERROR_CODES = frozenset(
+    {"ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"}
+)
 
-from bedrock_utils import BedrockConfig, InferenceConfig, ModelConfig, SystemPrompt  # noqa: E402
+# Parallel batch writers; stays well inside the client's connection pool
+DEFAULT_MAX_CONCURRENCY = 8
 
 
+@functools.cache
+def get_boto_config():
+    """Return the client config shared by every AWS client in this script."""
+    from botocore.config import Config
+
+    # Adaptive retries back off on CloudFormation/DynamoDB throttling instead of failing
+    return Config(
+        retries={"max_attempts": 10, "mode": "adaptive"},
+        max_pool_connections=32,
+        connect_timeout=5,
+        read_timeout=30,
+    )
+
+
+@functools.cache
+def get_session() -> boto3.Session:
+    """Return the shared session so clients reuse one credential chain and model loader."""
+    import boto3
+
+    return boto3.Session()
+
+
+@functools.cache
+def get_client(service: str, region: str):
+    """Return the shared client for an AWS service and region, created on first use."""
+    return get_session().client(service, region_name=region, config=get_boto_config())
+
+
+@functools.cache
 def get_aws_region() -> str:
     """
     Get the AWS region from the current session configuration.
@@ -37,8 +117,7 @@ def get_aws_region() -> str:
         RuntimeError: If region cannot be determined
     """
     try:
-        session = boto3.Session()
-        region = session.region_name
+        region = get_session().region_name
         if not region:
             raise RuntimeError("No AWS region configured")
         return region
@@ -46,6 +125,37 @@ def get_aws_region() -> str:
         raise RuntimeError(f"Failed to get AWS region: {e}")
 
 
+@functools.lru_cache(maxsize=4)
+def get_stack_outputs(stack_name: str, region: str) -> dict[str, str]:
+    """
+    Get all output values of a CloudFormation stack, keyed by output key.
+
+    The stack is described once per (stack, region); later lookups hit the cache.
+
+    Args:
+        stack_name: Name of the CloudFormation stack
+        region: AWS region
+
+    Returns:
+        Dictionary mapping output keys to output values
+
+    Raises:
+        RuntimeError: If the stack cannot be described
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        paginator = get_client("cloudformation", region).get_paginator("describe_stacks")
+
+        # Project the response down to the outputs; describe_stacks raises if
+        # the stack doesn't exist
+        outputs = paginator.paginate(StackName=stack_name).search("Stacks[].Outputs[]")
+        return {output["OutputKey"]: output["OutputValue"] for output in outputs if output}
+
+    except ClientError as e:
+        raise RuntimeError(f"Failed to get stack output: {e}")
+
+
 def get_stack_output(stack_name: str, output_key: str, region: str | None = None) -> str:
     """
     Get a specific output value from a CloudFormation stack.
@@ -61,28 +171,13 @@ def get_stack_output(stack_name: str, output_key: str, region: str | None = None
     Raises:
         RuntimeError: If stack or output not found
     """
-    try:
-        if not region:
-            region = get_aws_region()
-            
-        cf_client = boto3.client("cloudformation", region_name=region)
-            
-        response = cf_client.describe_stacks(StackName=stack_name)
-        
-        if not response["Stacks"]:
-            raise RuntimeError(f"Stack {stack_name} not found")
-            
-        stack = response["Stacks"][0]
-        outputs = stack.get("Outputs", [])
-        
-        for output in outputs:
-            if output["OutputKey"] == output_key:
-                return output["OutputValue"]
-                
+    if not region:
+        region = get_aws_region()
+
+    outputs = get_stack_outputs(stack_name, region)
+    if output_key not in outputs:
         raise RuntimeError(f"Output {output_key} not found in stack {stack_name}")
-        
-    except ClientError as e:
-        raise RuntimeError(f"Failed to get stack output: {e}")
+    return outputs[output_key]
 
 
 def get_default_table_name(region: str | None = None) -> str:
@@ -98,12 +193,15 @@ def get_default_table_name(region: str | None = None) -> str:
     return get_stack_output("WisconsinBotStack", "ModelConfigTableName", region)
 
 
-def parse_toml_config(config_file: str) -> dict[str, ModelConfig]:
+def parse_toml_config(config_file: str, fast: bool = False) -> dict[str, ModelConfig]:
     """
     Parse TOML configuration file and convert to ModelConfig objects.
 
     Args:
         config_file: Path to the TOML configuration file
+        fast: Build the models with model_construct, skipping validation.
+            Nested Bedrock fields are left as raw TOML values, so only use
+            this for listing configs, never for uploading them.
 
     Returns:
         Dictionary mapping config IDs to ModelConfig objects
@@ -112,12 +210,15 @@ def parse_toml_config(config_file: str) -> dict[str, ModelConfig]:
         FileNotFoundError: If config file doesn't exist
         ValueError: If configuration is invalid
     """
-    if not os.path.exists(config_file):
-        raise FileNotFoundError(f"Configuration file not found: {config_file}")
+    load_bedrock_utils()
+    from bedrock_utils import BedrockConfig, InferenceConfig, ModelConfig, SystemPrompt
 
     # Load TOML file
-    with open(config_file) as f:
-        toml_data = toml.load(f)
+    try:
+        with open(config_file, "rb") as f:
+            toml_data = tomllib.load(f)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Configuration file not found: {config_file}") from e
 
     configs = {}
 
@@ -129,34 +230,35 @@ def parse_toml_config(config_file: str) -> dict[str, ModelConfig]:
                 "prompt": config_data.get("prompt"),
             }
 
+            if fast:
+                bedrock_config = None
+                if "config" in config_data:
+                    bedrock_config = BedrockConfig.model_construct(**config_data["config"])
+                configs[config_id] = ModelConfig.model_construct(
+                    config=bedrock_config, **model_config_data
+                )
+                continue
+
             # Process Bedrock config if present
             if "config" in config_data:
-                bedrock_config_data = config_data["config"]
-
-                # Process system prompts
-                system_prompts = None
-                if "system" in bedrock_config_data:
-                    system_prompts = [
-                        SystemPrompt(**prompt_data) for prompt_data in bedrock_config_data["system"]
-                    ]
-
-                # Process inference config
-                inference_config = None
-                if "inferenceConfig" in bedrock_config_data:
-                    inference_config = InferenceConfig(**bedrock_config_data["inferenceConfig"])
-
-                # Process additional model request fields (anything not in the main config)
-                additional_fields = {}
-                excluded_keys = {"modelId", "system", "inferenceConfig"}
-                for key, value in bedrock_config_data.items():
-                    if key not in excluded_keys:
-                        additional_fields[key] = value
+                # Pop the known keys off one copy; whatever is left over becomes
+                # the additional model request fields
+                additional_fields = dict(config_data["config"])
+                model_id = additional_fields.pop("modelId")
+                system_data = additional_fields.pop("system", None)
+                inference_data = additional_fields.pop("inferenceConfig", None)
 
                 # Create BedrockConfig
                 bedrock_config = BedrockConfig(
-                    modelId=bedrock_config_data["modelId"],
-                    system=system_prompts,
-                    inferenceConfig=inference_config,
+                    modelId=model_id,
+                    system=(
+                        [SystemPrompt(**prompt_data) for prompt_data in system_data]
+                        if system_data is not None
+                        else None
+                    ),
+                    inferenceConfig=(
+                        InferenceConfig(**inference_data) if inference_data is not None else None
+                    ),
                     additionalModelRequestFields=additional_fields if additional_fields else None,
                 )
 
@@ -172,64 +274,166 @@ def parse_toml_config(config_file: str) -> dict[str, ModelConfig]:
     return configs
 
 
-def convert_floats_to_decimal(obj):
+def write_batch(client, table_name: str, requests: list[dict]):
     """
-    Recursively convert float values to Decimal for DynamoDB compatibility.
+    Send one BatchWriteItem call, resubmitting any unprocessed items with backoff.
+
+    Throttling errors that outlast botocore's own retries get the same backoff
+    as unprocessed items, since both mean the table is over its capacity.
 
     Args:
-        obj: Object that may contain float values
+        client: Low-level DynamoDB client
+        table_name: Name of the DynamoDB table
+        requests: Up to 25 marshalled PutRequest entries
+
+    Raises:
+        ClientError: On a non-throttling error, or throttling on the last attempt
+        RuntimeError: If items are still unprocessed after every attempt
+    """
+    from botocore.exceptions import ClientError
+
+    request_items = {table_name: requests}
+    for attempt in range(MAX_BATCH_ATTEMPTS):
+        try:
+            response = client.batch_write_item(RequestItems=request_items)
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code not in THROTTLING_ERROR_CODES or attempt == MAX_BATCH_ATTEMPTS - 1:
+                raise
+        else:
+            request_items = response.get("UnprocessedItems")
+            if not request_items:
+                logger.debug(f"Wrote batch of {len(requests)} items to {table_name}")
+                return
+        if attempt < MAX_BATCH_ATTEMPTS - 1:
+            delay = min(2**attempt * 0.05 + random.random() * 0.05, 5)
+            logger.debug(f"Batch throttled or partially written, retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+    unprocessed = sum(len(entries) for entries in request_items.values())
+    raise RuntimeError(f"{unprocessed} items still unprocessed after {MAX_BATCH_ATTEMPTS} attempts")
+
+
+def to_attribute_value(value) -> dict:
+    """
+    Marshal a JSON-compatible value straight into a DynamoDB attribute value.
+
+    The wire format carries numbers as strings, so floats go out as their
+    shortest repr without the Decimal round trip the resource layer needs.
+
+    Args:
+        value: Value from a model_dump(mode="json")
 
     Returns:
-        Object with floats converted to Decimal
+        Attribute value such as {"S": ...}, {"N": ...} or {"M": {...}}
     """
-    if isinstance(obj, float):
-        return Decimal(str(obj))
-    elif isinstance(obj, dict):
-        return {key: convert_floats_to_decimal(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_floats_to_decimal(item) for item in obj]
-    else:
-        return obj
+    value_type = type(value)
+    if value_type is str:
+        return {"S": value}
+    # bool before int, since True/False would otherwise pass as numbers
+    if value_type is bool:
+        return {"BOOL": value}
+    if value_type is int:
+        return {"N": str(value)}
+    if value_type is float:
+        return {"N": repr(value)}
+    if value_type is dict:
+        return {"M": {key: to_attribute_value(item) for key, item in value.items()}}
+    if value_type is list:
+        return {"L": [to_attribute_value(item) for item in value]}
+    if value is None:
+        return {"NULL": True}
+    raise TypeError(f"Cannot store {value_type.__name__} in DynamoDB")
+
+
+def build_put_request(config_id: str, model_config: ModelConfig) -> dict:
+    """
+    Marshal one configuration into a BatchWriteItem PutRequest.
+
+    Args:
+        config_id: ID of the config, for error messages
+        model_config: Configuration to marshal
+
+    Returns:
+        PutRequest entry with the item in DynamoDB wire format
+    """
+    try:
+        # mode="json" yields the same plain values as a JSON dump would, without
+        # rendering and re-parsing the text
+        item = model_config.model_dump(mode="json", by_alias=True, exclude_none=True)
+        return {"PutRequest": {"Item": to_attribute_value(item)["M"]}}
+    except Exception as e:
+        logger.error(f"✗ Error processing {config_id}: {e}")
+        raise
 
 
-def upload_to_dynamodb(configs: dict[str, ModelConfig], table_name: str, region: str | None = None):
+def upload_to_dynamodb(
+    configs: dict[str, ModelConfig],
+    table_name: str,
+    region: str | None = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+):
     """
     Upload model configurations to DynamoDB.
 
+    Every item is marshalled up front, then the 25-item batches are sent by up
+    to max_concurrency threads sharing the low-level client.
+
     Args:
         configs: Dictionary of ModelConfig objects keyed by ID
         table_name: Name of the DynamoDB table
         region: AWS region (optional, uses session default if not provided)
+        max_concurrency: Maximum number of batches in flight at once
 
     Raises:
         ClientError: If DynamoDB operations fail
     """
+    from botocore.exceptions import ClientError
+
     if not region:
         region = get_aws_region()
-        
-    dynamodb = boto3.resource("dynamodb", region_name=region)
-    table = dynamodb.Table(table_name)
 
-    print(f"Uploading {len(configs)} configurations to DynamoDB table: {table_name}")
+    # BatchWriteItem rejects repeated keys, so keep the last config per item id
+    latest = {config.id: (config_id, config) for config_id, config in configs.items()}
+    requests = [build_put_request(config_id, config) for config_id, config in latest.values()]
+    batches = [
+        requests[start : start + BATCH_WRITE_SIZE]
+        for start in range(0, len(requests), BATCH_WRITE_SIZE)
+    ]
 
-    for config_id, model_config in configs.items():
-        try:
-            # Convert ModelConfig to dict using pydantic's model_dump
-            item = model_config.model_dump(by_alias=True, exclude_none=True)
+    # Low-level clients are thread-safe, so every batch shares one
+    client = get_client("dynamodb", region)
 
-            # Convert floats to Decimal for DynamoDB compatibility
-            item = convert_floats_to_decimal(item)
+    logger.info(f"Uploading {len(configs)} configurations to DynamoDB table: {table_name}")
 
-            # Put item in DynamoDB
-            table.put_item(Item=item)
-            print(f"✓ Uploaded configuration: {config_id}")
+    try:
+        if len(batches) <= 1:
+            for batch in batches:
+                write_batch(client, table_name, batch)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+                futures = [
+                    executor.submit(write_batch, client, table_name, batch) for batch in batches
+                ]
+                for future in as_completed(futures):
+                    future.result()
 
-        except ClientError as e:
-            print(f"✗ Failed to upload {config_id}: {e}")
-            raise
-        except Exception as e:
-            print(f"✗ Error processing {config_id}: {e}")
-            raise
+    except ClientError as e:
+        logger.error(f"✗ Failed to upload configurations: {e}")
+        raise
+
+    # One record for the whole summary instead of a flush per config
+    logger.info("\n".join(f"✓ Uploaded configuration: {config_id}" for config_id in configs))
+
+
+def configure_logging(level: int):
+    """Send this script's log records to stdout as bare messages."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    # Our handler prints each record; don't hand it on to any root handlers as well
+    logger.propagate = False
 
 
 def main():
@@ -254,38 +458,62 @@ def main():
         action="store_true",
         help="Parse and validate configs without uploading to DynamoDB",
     )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f"Maximum parallel batch writers (default: {DEFAULT_MAX_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--skip-validation",
+        action="store_true",
+        help="With --dry-run, list configs without validating them (faster for large files)",
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "-v", "--verbose", action="store_true", help="Also log each DynamoDB batch write"
+    )
+    verbosity.add_argument("-q", "--quiet", action="store_true", help="Only log errors")
 
     args = parser.parse_args()
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    if args.skip_validation and not args.dry_run:
+        parser.error("--skip-validation is only allowed with --dry-run")
+
+    configure_logging(
+        logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    )
 
     try:
         # Parse configuration file
-        print(f"Parsing configuration file: {args.config_file}")
-        configs = parse_toml_config(args.config_file)
-        print(f"Successfully parsed {len(configs)} configurations")
+        logger.info(f"Parsing configuration file: {args.config_file}")
+        configs = parse_toml_config(args.config_file, fast=args.skip_validation)
+        logger.info(f"Successfully parsed {len(configs)} configurations")
 
         # Validate configurations
         for config_id, config in configs.items():
-            print(
+            logger.info(
                 f"  - {config_id}: {config.id} (model: {config.config.modelId if config.config else 'none'})"
             )
 
         if args.dry_run:
-            print("Dry run mode - not uploading to DynamoDB")
+            logger.info("Dry run mode - not uploading to DynamoDB")
             return
 
         # Get table name
         table_name = args.table_name
         if not table_name:
-            print("Getting table name from CDK stack...")
+            logger.info("Getting table name from CDK stack...")
             table_name = get_default_table_name(args.region)
-            print(f"Using table: {table_name}")
+            logger.info(f"Using table: {table_name}")
 
         # Upload to DynamoDB
-        upload_to_dynamodb(configs, table_name, args.region)
-        print("✓ All configurations uploaded successfully")
+        upload_to_dynamodb(configs, table_name, args.region, args.max_concurrency)
+        logger.info("✓ All configurations uploaded successfully")
 
     except Exception as e:
-        print(f"✗ Error: {e}")
+        logger.error(f"✗ Error: {e}")
         sys.exit(1)
 
 